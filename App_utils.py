@@ -6,278 +6,552 @@ Provides DB init, auth, and CRUD helpers.
 This version fixes function names and signatures so TrackSwift.py and App_utils.py match.
 """
 
+import queue
 import sqlite3
+import threading
 import pandas as pd
+import streamlit as st
+import hmac
+from contextlib import contextmanager
 from datetime import datetime
-import hashlib
-from typing import Optional, Tuple
+from functools import lru_cache
+from itertools import chain
+from typing import Iterator, Optional, Sequence, Tuple, Union
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 DB_FILE = "logistics.db"
+# Store datetimes as 'YYYY-MM-DD HH:MM:SS' text, matching the seeded rows. This
+# replaces sqlite3's default datetime adapter, deprecated since Python 3.12.
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=' ', timespec='seconds'))
+
+# Bump when init_db's tables, indexes or seed data change
+SCHEMA_VERSION = 2
+
+# SQL kept as constants so every call sends the identical string and hits the
+# connection's prepared-statement cache.
+_SHIPMENT_COLUMNS = "id, sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id"
+_SQL_ALL_SHIPMENTS = f"SELECT {_SHIPMENT_COLUMNS} FROM Shipments"
+_SQL_SHIPMENT_BY_TRACKING_ID = f"SELECT {_SHIPMENT_COLUMNS} FROM Shipments WHERE tracking_id = ?"
+_SQL_RECENT_SHIPMENTS = """
+    SELECT tracking_id, sender_name, status, created_date
+    FROM Shipments
+    ORDER BY created_date DESC
+    LIMIT ?
+"""
+_SQL_USER_SHIPMENTS = f"SELECT {_SHIPMENT_COLUMNS} FROM Shipments WHERE user_id = ?"
+_SQL_USER_SHIPMENT_LIST = "SELECT tracking_id, status, created_date FROM Shipments WHERE user_id = ?"
+_SQL_ALL_ORDERS = "SELECT id, shipment_id, items, quantity, total_cost FROM Orders"
+# Formatted with one "?" per status; the shape depends only on the number of statuses
+_SQL_ORDERS_WITH_SHIPMENTS = """
+    SELECT o.id AS order_id, s.tracking_id, s.sender_name, s.receiver_name, s.status, o.items, o.quantity, o.total_cost
+    FROM Orders o
+    JOIN Shipments s ON s.id = o.shipment_id
+    WHERE s.status IN ({placeholders})
+    ORDER BY o.id
+"""
+_SQL_USER_ORDERS_WITH_SHIPMENTS = """
+    SELECT o.id AS order_id, s.tracking_id, s.sender_name, s.receiver_name, s.status, o.items, o.quantity, o.total_cost
+    FROM Orders o
+    JOIN Shipments s ON s.id = o.shipment_id
+    WHERE s.user_id = ? AND s.status IN ({placeholders})
+    ORDER BY o.id
+"""
+_SQL_DASHBOARD_KPIS = """
+    SELECT s.status, COUNT(DISTINCT s.id) AS shipments, COALESCE(SUM(o.total_cost), 0) AS revenue
+    FROM Shipments s
+    LEFT JOIN Orders o ON o.shipment_id = s.id
+    GROUP BY s.status
+"""
+_SQL_USER_DASHBOARD_KPIS = """
+    SELECT s.status, COUNT(DISTINCT s.id) AS shipments, COALESCE(SUM(o.total_cost), 0) AS revenue
+    FROM Shipments s
+    LEFT JOIN Orders o ON o.shipment_id = s.id
+    WHERE s.user_id = ?
+    GROUP BY s.status
+"""
+_SQL_ADD_USER = "INSERT INTO Users (username, password, role) VALUES (?, ?, ?)"
+_SQL_UPDATE_USER_PASSWORD = "UPDATE Users SET password = ? WHERE username = ?"
+_SQL_GET_USER = "SELECT id, username, role FROM Users WHERE username = ?"
+_SQL_LOGIN = "SELECT password, role FROM Users WHERE username = ?"
+_SQL_ADD_SHIPMENT = """
+    INSERT INTO Shipments (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+_SQL_UPDATE_SHIPMENT_STATUS = "UPDATE Shipments SET status = ? WHERE tracking_id = ?"
+_SQL_ADD_ORDER = """
+    INSERT INTO Orders (shipment_id, items, quantity, total_cost)
+    VALUES (?, ?, ?, ?)
+    RETURNING id
+"""
+
+# Connections are pooled for the whole process so SQLite keeps its page cache
+# between Streamlit reruns. Writes are serialized through _WRITE_LOCK.
+_POOL_MAX_SIZE = 4
+_POOL: Optional["_ConnectionPool"] = None
+_POOL_LOCK = threading.Lock()
+_WRITE_LOCK = threading.RLock()
+
+# Bumped by every write helper; cached readers take it as a key argument so
+# a write invalidates them on the next rerun.
+_DATA_VERSION = 0
+
+# Argon2id with the OWASP minimum parameters (46 MiB, 1 pass, 1 lane)
+_PASSWORD_HASHER = PasswordHasher(time_cost=1, memory_cost=47104, parallelism=1)
 
-def get_connection():
-    """Return a sqlite3 connection. Set row_factory for named access."""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+def hash_password(password: str) -> str:
+    """Return the Argon2id hash stored for a password."""
+    return _PASSWORD_HASHER.hash(password)
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    """
+    Check a password against its stored hash. Also accepts the plain-text
+    passwords stored by older versions of the app.
+    """
+    if not stored_hash.startswith("$argon2"):
+        return hmac.compare_digest(stored_hash.encode(), password.encode())
+    try:
+        return _PASSWORD_HASHER.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+# Demo accounts as (username, password, role)
+_DEMO_USERS = (
+    ('admin', 'admin', 'admin'),
+    ('manager', 'manager', 'manager'),
+    ('customer1', 'cust1', 'customer'),
+    ('customer2', 'cust2', 'customer'),
+    ('shipper', 'ship1', 'shipper')
+)
+
+@lru_cache(maxsize=1)
+def _default_users() -> Tuple[Tuple[str, str, str], ...]:
+    """Demo accounts as (username, password_hash, role); hashed once per process, on first seed."""
+    return tuple((username, hash_password(password), role) for username, password, role in _DEMO_USERS)
+
+def _migrate_legacy_users(cursor: sqlite3.Cursor) -> None:
+    """
+    Upgrade Users rows written before schema versioning: hash the plain-text
+    passwords and replace the old catch-all 'user' role.
+    """
+    cursor.execute("SELECT id, password FROM Users WHERE password NOT LIKE '$argon2%'")
+    cursor.executemany(
+        "UPDATE Users SET password = ? WHERE id = ?",
+        [(hash_password(row["password"]), row["id"]) for row in cursor.fetchall()]
+    )
+    # Demo accounts get their current role; any other 'user' becomes a customer
+    cursor.executemany(
+        "UPDATE Users SET role = ? WHERE username = ? AND role = 'user'",
+        [(role, username) for username, _, role in _DEMO_USERS]
+    )
+    cursor.execute("UPDATE Users SET role = 'customer' WHERE role = 'user'")
+
+def _bump_data_version():
+    """Invalidate cached reads after a write."""
+    global _DATA_VERSION
+    _DATA_VERSION += 1
+
+class _ConnectionPool:
+    """LIFO pool of sqlite3 connections, opened lazily up to max_size."""
+
+    def __init__(self, max_size: int):
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._max_size = max_size
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self._max_size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return _open_connection()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+@contextmanager
+def get_connection() -> Iterator[sqlite3.Connection]:
+    """Check a sqlite3 connection out of the process-wide pool for a with-block."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # Every connection to :memory: is a separate database, so keep just one
+                _POOL = _ConnectionPool(1 if DB_FILE == ":memory:" else _POOL_MAX_SIZE)
+    conn = _POOL.acquire()
+    try:
+        yield conn
+    finally:
+        _POOL.release(conn)
+
+def _open_connection():
+    """Open a sqlite3 connection. Set row_factory for named access."""
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    # WAL lets dashboard reads run alongside writes; NORMAL sync is safe under WAL.
+    # WAL is not available for in-memory databases, so skip it there.
+    journal = "PRAGMA journal_mode=WAL;" if DB_FILE != ":memory:" else ""
+    conn.executescript(journal + """
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+        PRAGMA busy_timeout=5000;
+    """)
     return conn
 
 def init_db():
     """Create tables and seed demo data if missing."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL
-        )
-    """)
+    with _WRITE_LOCK, get_connection() as conn:
+        cursor = conn.cursor()
 
-    # Shipments table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Shipments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sender_name TEXT NOT NULL,
-            receiver_name TEXT NOT NULL,
-            origin TEXT NOT NULL,
-            destination TEXT NOT NULL,
-            status TEXT NOT NULL,
-            tracking_id TEXT UNIQUE NOT NULL,
-            created_date TEXT NOT NULL,
-            user_id TEXT NOT NULL
-        )
-    """)
+        # Skip everything when this database was already initialised at the current version
+        stored_version = None
+        try:
+            cursor.execute("SELECT value FROM Meta WHERE key = 'schema_version'")
+            row = cursor.fetchone()
+            stored_version = row["value"] if row is not None else None
+            if stored_version == str(SCHEMA_VERSION):
+                return
+        except sqlite3.OperationalError:
+            pass
 
-    # Orders table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            shipment_id INTEGER NOT NULL,
-            items TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            total_cost REAL NOT NULL,
-            FOREIGN KEY (shipment_id) REFERENCES Shipments (id)
-        )
-    """)
+        # Meta table (key/value, holds schema_version)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+
+        # Users table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL
+            )
+        """)
+
+        # Shipments table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Shipments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_name TEXT NOT NULL,
+                receiver_name TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tracking_id TEXT UNIQUE NOT NULL,
+                created_date TEXT NOT NULL,
+                user_id TEXT NOT NULL
+            )
+        """)
+
+        # Orders table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shipment_id INTEGER NOT NULL,
+                items TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                total_cost REAL NOT NULL,
+                FOREIGN KEY (shipment_id) REFERENCES Shipments (id)
+            )
+        """)
+
+        # Indexes for per-user lookups, order joins, date-ordered listings and status counts
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_shipments_user_id ON Shipments(user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_shipment_id ON Orders(shipment_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_shipments_created_date ON Shipments(created_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_shipments_status ON Shipments(status)")
+
+        # Seed everything in one transaction so first run pays a single commit.
+        # The seed is reproducible, so skip the fsync for it and restore afterwards.
+        cursor.execute("PRAGMA synchronous=OFF")
+        try:
+            # Inside the try so a failed BEGIN (e.g. database locked) still restores synchronous
+            cursor.execute("BEGIN IMMEDIATE")
+
+            # Databases from before the Meta table hold plain-text passwords
+            if stored_version is None:
+                _migrate_legacy_users(cursor)
+
+            # Seed users if table empty
+            cursor.execute("SELECT 1 FROM Users LIMIT 1")
+            if cursor.fetchone() is None:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, ?, ?)",
+                    _default_users()
+                )
 
-    # Seed users if table empty
-    cursor.execute("SELECT COUNT(*) as c FROM Users")
-    if cursor.fetchone()["c"] == 0:
-        sample_users = [
-            ('admin', 'admin', 'admin'),
-            ('manager', 'manager', 'manager'),
-            ('customer1', 'cust1', 'user'),
-            ('customer2', 'cust2', 'user'),
-            ('shipper', 'ship1', 'user')
-        ]
-        for username, password, role in sample_users:
-            try:
-                cursor.execute("INSERT INTO Users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
-            except sqlite3.IntegrityError:
-                pass
-
-    # Seed shipments + orders if shipments empty
-    cursor.execute("SELECT COUNT(*) as c FROM Shipments")
-    if cursor.fetchone()["c"] == 0:
-        sample_order_details = [
-            ('Laptop, Phone', 2, 1500.0),
-            ('Books, Notebook', 5, 200.0),
-            ('Clothes', 10, 300.0),
-            ('Electronics', 1, 800.0),
-            ('Furniture', 3, 500.0),
-            ('Test Items', 4, 100.0),
-            ('Manager Goods', 6, 400.0),
-            ('User Parcel', 2, 250.0)
-        ]
-
-        sample_shipments = [
-            ('John Doe', 'Jane Smith', 'New York', 'Los Angeles', 'Pending', 'TRK001', '2024-01-01 10:00:00', 'admin'),
-            ('Alice Brown', 'Bob Wilson', 'Chicago', 'Miami', 'In Transit', 'TRK002', '2024-01-02 11:00:00', 'manager'),
-            ('Customer One', 'Receiver A', 'Boston', 'Seattle', 'Delivered', 'TRK003', '2024-01-03 12:00:00', 'customer1'),
-            ('Customer Two', 'Receiver B', 'Dallas', 'Denver', 'Pending', 'TRK004', '2024-01-04 13:00:00', 'customer2'),
-            ('Shipper X', 'Receiver C', 'Phoenix', 'Portland', 'In Transit', 'TRK005', '2024-01-05 14:00:00', 'shipper'),
-            ('Admin Test', 'User Test', 'Atlanta', 'Austin', 'Delivered', 'TRK006', '2024-01-06 15:00:00', 'admin'),
-            ('Manager Shipment', 'Client D', 'San Francisco', 'San Diego', 'Pending', 'TRK007', '2024-01-07 16:00:00', 'manager'),
-            ('User Shipment', 'Friend E', 'Houston', 'Honolulu', 'In Transit', 'TRK008', '2024-01-08 17:00:00', 'customer1')
-        ]
-
-        for idx, shipment in enumerate(sample_shipments):
-            try:
-                cursor.execute("""
-                    INSERT INTO Shipments (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, shipment)
-                shipment_id = cursor.lastrowid
-                items, quantity, total_cost = sample_order_details[idx]
-                cursor.execute("""
+            # Seed shipments + orders if shipments empty
+            cursor.execute("SELECT 1 FROM Shipments LIMIT 1")
+            if cursor.fetchone() is None:
+                sample_order_details = [
+                    ('Laptop, Phone', 2, 1500.0),
+                    ('Books, Notebook', 5, 200.0),
+                    ('Clothes', 10, 300.0),
+                    ('Electronics', 1, 800.0),
+                    ('Furniture', 3, 500.0),
+                    ('Test Items', 4, 100.0),
+                    ('Manager Goods', 6, 400.0),
+                    ('User Parcel', 2, 250.0)
+                ]
+
+                sample_shipments = [
+                    ('John Doe', 'Jane Smith', 'New York', 'Los Angeles', 'Pending', 'TRK001', '2024-01-01 10:00:00', 'admin'),
+                    ('Alice Brown', 'Bob Wilson', 'Chicago', 'Miami', 'In Transit', 'TRK002', '2024-01-02 11:00:00', 'manager'),
+                    ('Customer One', 'Receiver A', 'Boston', 'Seattle', 'Delivered', 'TRK003', '2024-01-03 12:00:00', 'customer1'),
+                    ('Customer Two', 'Receiver B', 'Dallas', 'Denver', 'Pending', 'TRK004', '2024-01-04 13:00:00', 'customer2'),
+                    ('Shipper X', 'Receiver C', 'Phoenix', 'Portland', 'In Transit', 'TRK005', '2024-01-05 14:00:00', 'shipper'),
+                    ('Admin Test', 'User Test', 'Atlanta', 'Austin', 'Delivered', 'TRK006', '2024-01-06 15:00:00', 'admin'),
+                    ('Manager Shipment', 'Client D', 'San Francisco', 'San Diego', 'Pending', 'TRK007', '2024-01-07 16:00:00', 'manager'),
+                    ('User Shipment', 'Friend E', 'Houston', 'Honolulu', 'In Transit', 'TRK008', '2024-01-08 17:00:00', 'customer1')
+                ]
+
+                # One multi-row INSERT: a single parse and step for all sample shipments
+                placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * len(sample_shipments))
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO Shipments (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)
+                    VALUES {placeholders}
+                """, list(chain.from_iterable(sample_shipments)))
+
+                # Link each order to its shipment by tracking id inside SQLite
+                cursor.executemany("""
                     INSERT INTO Orders (shipment_id, items, quantity, total_cost)
-                    VALUES (?, ?, ?, ?)
-                """, (shipment_id, items, quantity, total_cost))
-            except sqlite3.IntegrityError:
-                pass
-
-    conn.commit()
-    conn.close()
+                    SELECT id, ?, ?, ? FROM Shipments WHERE tracking_id = ?
+                """, [
+                    (items, quantity, total_cost, shipment[5])
+                    for shipment, (items, quantity, total_cost) in zip(sample_shipments, sample_order_details)
+                ])
+
+                # Give the query planner statistics for the freshly seeded tables
+                cursor.execute("ANALYZE")
+
+            cursor.execute(
+                "INSERT OR REPLACE INTO Meta (key, value) VALUES ('schema_version', ?)",
+                (str(SCHEMA_VERSION),)
+            )
+        except Exception:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA synchronous=NORMAL")
 
-def add_user(username: str, password: str, role: str = 'user') -> bool:
+def add_user(username: str, password: str, role: str = 'customer') -> bool:
     """
     Add a new user. Returns True if added, False if username exists.
-    (Plain-text password used for demo only. In production, hash passwords.)
+    The password is stored as an Argon2id hash.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO Users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
+    password_hash = hash_password(password)
+    with _WRITE_LOCK, get_connection() as conn:
+        try:
+            with conn:
+                conn.execute(_SQL_ADD_USER, (username, password_hash, role))
+            return True
+        except sqlite3.IntegrityError:
+            return False
 
 def get_user(username: str) -> Optional[sqlite3.Row]:
-    """Return user row (sqlite Row) or None."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    """Return the user's id, username and role as a sqlite Row, or None. The password hash is not included."""
+    with get_connection() as conn:
+        return conn.execute(_SQL_GET_USER, (username,)).fetchone()
 
 def authenticate_user(username: str, password: str) -> Optional[str]:
     """
-    Authenticate user (plain-text for demo). Returns role string on success, otherwise None.
+    Authenticate user against the stored password hash. Returns role string on success, otherwise None.
     """
-    user = get_user(username)
-    if user and user['password'] == password:
-        return user['role']
-    return None
-
-def add_shipment(sender_name: str, receiver_name: str, origin: str, destination: str, status: str, tracking_id: str, created_date: str, user_id: str) -> int:
-    """Insert a new shipment and return its id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO Shipments (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id))
-    shipment_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    # Only the hash and role are needed; salted hashes can't be matched in SQL
+    with get_connection() as conn:
+        user = conn.execute(_SQL_LOGIN, (username,)).fetchone()
+    if not user or not verify_password(user['password'], password):
+        return None
+    # Upgrade legacy plain-text passwords (or outdated Argon2 parameters) on login
+    stored_hash = user['password']
+    if not stored_hash.startswith("$argon2") or _PASSWORD_HASHER.check_needs_rehash(stored_hash):
+        password_hash = hash_password(password)
+        with _WRITE_LOCK, get_connection() as conn:
+            with conn:
+                conn.execute(_SQL_UPDATE_USER_PASSWORD, (password_hash, username))
+    return user['role']
+
+def add_shipment(sender_name: str, receiver_name: str, origin: str, destination: str, status: str, tracking_id: str, created_date: Union[str, datetime], user_id: str) -> int:
+    """Insert a new shipment and return its id. created_date may be a datetime or preformatted text."""
+    with _WRITE_LOCK, get_connection() as conn:
+        with conn:
+            shipment_id = conn.execute(_SQL_ADD_SHIPMENT, (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)).fetchone()[0]
+        _bump_data_version()
     return shipment_id
 
-def get_shipments(tracking_id: Optional[str] = None) -> pd.DataFrame:
-    """Return shipments as a pandas DataFrame. If tracking_id provided, filter by it."""
-    conn = get_connection()
+# Low-cardinality shipment columns are stored as categoricals to save memory
+_SHIPMENT_DTYPES = {'status': 'category', 'origin': 'category', 'destination': 'category'}
+
+def _query_df(sql: str, params: tuple = (), parse_dates: Optional[list] = None, dtype: Optional[dict] = None) -> pd.DataFrame:
+    """Run a read query and build a DataFrame straight from the fetched rows."""
+    with get_connection() as conn:
+        return _cursor_df(conn.execute(sql, params), parse_dates, dtype)
+
+def _cursor_df(cursor: sqlite3.Cursor, parse_dates: Optional[list] = None, dtype: Optional[dict] = None) -> pd.DataFrame:
+    """Fetch all rows from an executed cursor into a DataFrame."""
+    columns = [d[0] for d in cursor.description]
+    df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+    for col in parse_dates or ():
+        df[col] = pd.to_datetime(df[col])
+    if dtype:
+        df = df.astype({col: t for col, t in dtype.items() if col in df.columns})
+    return df
+
+def fetch_shipments(user_id: Optional[str] = None, tracking_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Return shipments as a pandas DataFrame, optionally filtered by tracking_id
+    or by owner (user_id). tracking_id wins if both are given.
+    """
+    return _fetch_shipments(user_id, tracking_id, _DATA_VERSION)
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _fetch_shipments(user_id: Optional[str], tracking_id: Optional[str], version: int) -> pd.DataFrame:
+    """Cached body of fetch_shipments; `version` is only a cache key."""
     if tracking_id:
-        df = pd.read_sql_query("SELECT * FROM Shipments WHERE tracking_id = ?", conn, params=(tracking_id,))
+        sql, params = _SQL_SHIPMENT_BY_TRACKING_ID, (tracking_id,)
+    elif user_id:
+        sql, params = _SQL_USER_SHIPMENTS, (user_id,)
     else:
-        df = pd.read_sql_query("SELECT * FROM Shipments", conn)
-    conn.close()
-    return df
+        sql, params = _SQL_ALL_SHIPMENTS, ()
+    return _query_df(sql, params, parse_dates=['created_date'], dtype=_SHIPMENT_DTYPES)
+
+def get_shipment_by_tracking(tracking_id: str) -> Optional[dict]:
+    """Return a single shipment as a dict, or None if the tracking id is unknown."""
+    return _load_shipment_by_tracking(tracking_id, _DATA_VERSION)
+
+@st.cache_data(ttl=30, max_entries=256, show_spinner=False)
+def _load_shipment_by_tracking(tracking_id: str, version: int) -> Optional[dict]:
+    """Cached body of get_shipment_by_tracking; `version` is only a cache key."""
+    with get_connection() as conn:
+        row = conn.execute(_SQL_SHIPMENT_BY_TRACKING_ID, (tracking_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+def get_shipments(tracking_id: Optional[str] = None) -> pd.DataFrame:
+    """Return shipments as a pandas DataFrame. If tracking_id provided, filter by it."""
+    return fetch_shipments(tracking_id=tracking_id)
 
 def update_shipment_status(tracking_id: str, new_status: str) -> None:
     """Update shipment status by tracking_id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE Shipments SET status = ? WHERE tracking_id = ?", (new_status, tracking_id))
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK, get_connection() as conn:
+        with conn:
+            conn.execute(_SQL_UPDATE_SHIPMENT_STATUS, (new_status, tracking_id))
+        _bump_data_version()
+
+def bulk_update_statuses(changes: Sequence[Tuple[str, str]]) -> int:
+    """
+    Apply (tracking_id, new_status) pairs in one transaction with a single
+    prepared UPDATE. Returns the number of shipments updated.
+    """
+    if not changes:
+        return 0
+    with _WRITE_LOCK, get_connection() as conn:
+        with conn:
+            cur = conn.executemany(_SQL_UPDATE_SHIPMENT_STATUS, [(status, tid) for tid, status in changes])
+        _bump_data_version()
+    return cur.rowcount
 
 def add_order(shipment_id: int, items: str, quantity: int, total_cost: float) -> int:
     """Insert an order linked to a shipment and return the new order id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO Orders (shipment_id, items, quantity, total_cost)
-        VALUES (?, ?, ?, ?)
-    """, (shipment_id, items, quantity, total_cost))
-    order_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK, get_connection() as conn:
+        with conn:
+            order_id = conn.execute(_SQL_ADD_ORDER, (shipment_id, items, quantity, total_cost)).fetchone()[0]
+        _bump_data_version()
     return order_id
 
+def add_shipment_with_order(sender_name: str, receiver_name: str, origin: str, destination: str, status: str, tracking_id: str, created_date: Union[str, datetime], user_id: str, items: str, quantity: int, total_cost: float) -> int:
+    """Insert a shipment and its order in one transaction and return the shipment id."""
+    with _WRITE_LOCK, get_connection() as conn:
+        with conn:
+            shipment_id = conn.execute(_SQL_ADD_SHIPMENT, (sender_name, receiver_name, origin, destination, status, tracking_id, created_date, user_id)).fetchone()[0]
+            conn.execute(_SQL_ADD_ORDER, (shipment_id, items, quantity, total_cost)).fetchone()
+        _bump_data_version()
+    return shipment_id
+
 def get_orders() -> pd.DataFrame:
     """Return all orders as a DataFrame."""
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM Orders", conn)
-    conn.close()
-    return df
+    return _query_df(_SQL_ALL_ORDERS)
+
+def get_orders_with_shipments(status_filter: Sequence[str], user_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Return orders joined with their shipment for the View Orders table, limited
+    to shipments whose status is in status_filter and, if given, owned by user_id.
+    """
+    # Sorted and de-duplicated so the cache key and SQL text don't depend on selection order
+    return _load_orders_with_shipments(tuple(sorted(set(status_filter))), user_id, _DATA_VERSION)
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _load_orders_with_shipments(statuses: Tuple[str, ...], user_id: Optional[str], version: int) -> pd.DataFrame:
+    """Cached body of get_orders_with_shipments; `version` is only a cache key."""
+    placeholders = ", ".join("?" * len(statuses))
+    if user_id:
+        sql, params = _SQL_USER_ORDERS_WITH_SHIPMENTS.format(placeholders=placeholders), (user_id, *statuses)
+    else:
+        sql, params = _SQL_ORDERS_WITH_SHIPMENTS.format(placeholders=placeholders), statuses
+    # status stays plain text: the View Orders editor sets values outside the filtered categories
+    return _query_df(sql, params)
 
 def get_user_shipments(username: str) -> pd.DataFrame:
     """Return shipments associated with the given username."""
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM Shipments WHERE user_id = ?", conn, params=(username,))
-    conn.close()
-    return df
-
-def get_all_data_for_dashboard() -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Return shipments_df and orders_df for dashboard analytics."""
-    shipments_df = get_shipments()
-    orders_df = get_orders()
-    # ensure datetime column parsed for sorting if exists
-    if 'created_date' in shipments_df.columns:
-        try:
-            shipments_df['created_date'] = pd.to_datetime(shipments_df['created_date'])
-        except Exception:
-            pass
-    return shipments_df, orders_df
-
-# ---------------------- Streamlit Page Functions ----------------------
-
-import streamlit as st
+    return fetch_shipments(user_id=username)
 
-def dashboard_page():
-    st.subheader("📊 Dashboard")
-    shipments, orders = get_all_data_for_dashboard()
-    st.write("### Shipments Overview")
-    st.dataframe(shipments)
-    st.write("### Orders Overview")
-    st.dataframe(orders)
-
-def add_shipment_page():
-    st.subheader("➕ Add New Shipment")
-    with st.form("add_shipment_form"):
-        sender_name = st.text_input("Sender Name")
-        receiver_name = st.text_input("Receiver Name")
-        origin = st.text_input("Origin")
-        destination = st.text_input("Destination")
-        status = st.selectbox("Status", ["Pending", "In Transit", "Delivered"])
-        tracking_id = st.text_input("Tracking ID")
-        submitted = st.form_submit_button("Add Shipment")
-
-        if submitted:
-            if sender_name and receiver_name and origin and destination and tracking_id:
-                shipment_id = add_shipment(
-                    sender_name, receiver_name, origin, destination, status,
-                    tracking_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    st.session_state.username
-                )
-                st.success(f"Shipment added successfully! ID: {shipment_id}")
-            else:
-                st.warning("Please fill out all required fields.")
-
-def track_shipment_page():
-    st.subheader("🔍 Track Shipment")
-    tracking_id = st.text_input("Enter Tracking ID")
-    if tracking_id:
-        df = get_shipments(tracking_id)
-        if not df.empty:
-            st.dataframe(df)
-        else:
-            st.warning("No shipment found with that tracking ID.")
-
-def view_orders_page():
-    st.subheader("📋 View Orders")
-    df = get_orders()
-    st.dataframe(df)
-
-def profile_page():
-    st.subheader("👤 User Profile")
-    st.info(f"Logged in as: {st.session_state.username}")
+def get_user_shipment_list(username: str) -> pd.DataFrame:
+    """Return only tracking_id, status and created_date for the user's shipments."""
+    return _load_user_shipment_list(username, _DATA_VERSION)
 
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _load_user_shipment_list(username: str, version: int) -> pd.DataFrame:
+    """Cached body of get_user_shipment_list; `version` is only a cache key."""
+    return _query_df(_SQL_USER_SHIPMENT_LIST, (username,), parse_dates=['created_date'], dtype=_SHIPMENT_DTYPES)
 
+def get_dashboard_kpis(user_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Return per-status shipment counts and order revenue as a small DataFrame
+    (columns: status, shipments, revenue). Optionally restricted to one user.
+    """
+    return _load_dashboard_kpis(user_id, _DATA_VERSION)
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_dashboard_kpis(user_id: Optional[str], version: int) -> pd.DataFrame:
+    """Cached body of get_dashboard_kpis; `version` is only a cache key."""
+    if user_id:
+        return _query_df(_SQL_USER_DASHBOARD_KPIS, (user_id,))
+    return _query_df(_SQL_DASHBOARD_KPIS)
 
+def get_dashboard_summary(recent_n: int = 5) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Return (kpis, recent) for the dashboard: the get_dashboard_kpis frame and
+    the recent_n newest shipments, read on a single pooled connection.
+    """
+    return _load_dashboard_summary(recent_n, _DATA_VERSION)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_dashboard_summary(recent_n: int, version: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Cached body of get_dashboard_summary; `version` is only a cache key."""
+    with get_connection() as conn:
+        kpis = _cursor_df(conn.execute(_SQL_DASHBOARD_KPIS))
+        recent = _cursor_df(conn.execute(_SQL_RECENT_SHIPMENTS, (recent_n,)), parse_dates=['created_date'], dtype=_SHIPMENT_DTYPES)
+    return kpis, recent
@@ -6,16 +6,15 @@ Run with:
     streamlit run TrackSwift.py
 """
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import uuid
-import App_utils as app
+import secrets
+import sqlite3
+from functools import lru_cache
 # Import utilities (fixed names/signatures)
 from App_utils import (
-    init_db, add_user, get_user, authenticate_user,
-    add_shipment, get_shipments, update_shipment_status,
-    add_order, get_orders, get_user_shipments,
-    get_all_data_for_dashboard
+    init_db, authenticate_user, update_shipment_status, add_shipment_with_order,
+    get_dashboard_kpis, get_orders_with_shipments, get_shipment_by_tracking,
+    get_dashboard_summary, bulk_update_statuses, get_user_shipment_list
 )
 
 # Page config for wide layout and title
@@ -39,25 +38,6 @@ if not st.session_state.get('db_initialized', False):
     st.session_state.db_initialized = True
 
 # Login Page
-import streamlit as st
-
-# ✅ FIXED AUTH FUNCTION (include shipper properly)
-def authenticate_user(username, password):
-    # Demo accounts
-    accounts = {
-        "admin": {"password": "admin", "role": "Admin"},
-        "manager": {"password": "manager", "role": "Manager"},
-        "customer1": {"password": "cust1", "role": "Customer"},
-        "customer2": {"password": "cust2", "role": "Customer"},
-        "shipper": {"password": "ship1", "role": "Shipper"},
-    }
-
-    user = accounts.get(username)
-    if user and user["password"] == password:
-        return user["role"]
-    return None
-
-
 def login_page():
     # --- CSS ---
     st.markdown(
@@ -180,7 +160,7 @@ def login_page():
                         st.session_state.username = username
                         st.session_state.role = authenticated_role
                         st.success(f"Welcome, {username}! You are logged in as {authenticated_role}.")
-                        st.experimental_rerun()
+                        st.rerun()
                     else:
                         # 🚫 Role mismatch
                         st.error(f"Role mismatch: '{username}' is actually a {authenticated_role}. Please select the correct role.")
@@ -218,6 +198,8 @@ def main_app():
         st.session_state.logged_in = False
         st.session_state.username = None
         st.session_state.role = None
+        # Don't show this user's last tracking lookup to the next account
+        st.session_state.pop('tracked_id', None)
         st.rerun()
 
     # ---------------- Main Page Display ----------------
@@ -249,18 +231,29 @@ def main_app():
 
 
 
+# Vega-Lite spec for the status pie; only data.values changes between reruns
+PIE_SPEC = {
+    "title": "Shipment Status Distribution",
+    "mark": {"type": "arc", "tooltip": True},
+    "encoding": {
+        "theta": {"field": "shipments", "type": "quantitative"},
+        "color": {"field": "status", "type": "nominal"},
+    },
+}
+
 # Dashboard Page
 def dashboard_page():
     st.header("📊 Dashboard")
     st.write("Key metrics and reports for logistics performance.")
 
-    # Get data
-    shipments_df, orders_df = get_all_data_for_dashboard()
-    total_shipments = len(shipments_df)
-    pending = len(shipments_df[shipments_df['status'] == 'Pending'])
-    in_transit = len(shipments_df[shipments_df['status'] == 'In Transit'])
-    delivered = len(shipments_df[shipments_df['status'] == 'Delivered'])
-    total_revenue = orders_df['total_cost'].sum() if not orders_df.empty else 0
+    # Get data (KPIs are aggregated in SQL, one row per status, plus the newest shipments)
+    kpis, recent = get_dashboard_summary(5)
+    status_counts = kpis.set_index('status')['shipments']
+    total_shipments = int(status_counts.sum())
+    pending = int(status_counts.get('Pending', 0))
+    in_transit = int(status_counts.get('In Transit', 0))
+    delivered = int(status_counts.get('Delivered', 0))
+    total_revenue = kpis['revenue'].sum()
 
     # Metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -271,27 +264,21 @@ def dashboard_page():
 
     st.metric("Total Revenue", f"${total_revenue:.2f}")
 
-    # Pie chart for status distribution (using Plotly)
+    # Pie chart for status distribution (plain Vega-Lite spec)
     if total_shipments > 0:
-        status_counts = shipments_df['status'].value_counts()
-        import plotly.express as px
-        fig = px.pie(values=status_counts.values, names=status_counts.index, title="Shipment Status Distribution")
-        st.plotly_chart(fig, use_container_width=True)
+        pie_data = kpis[['status', 'shipments']].to_dict("records")
+        st.vega_lite_chart({**PIE_SPEC, "data": {"values": pie_data}}, use_container_width=True)
     else:
         st.info("No shipments yet. Add some to see analytics!")
 
     # Simple table for recent shipments (last 5)
-    if not shipments_df.empty:
+    if total_shipments > 0:
         st.subheader("Recent Shipments")
-        recent = shipments_df.sort_values('created_date').tail(5)[['tracking_id', 'sender_name', 'status', 'created_date']]
         st.dataframe(recent)
 
 # Add Shipment Page
 def add_shipment_page():
     st.header("📦 Add New Shipment")
-    # If user role is not admin/manager/shipper allow only own shipments — demo logic
-    if st.session_state.role == 'user' and st.session_state.username not in ['admin', 'manager']:
-        st.warning("Basic users can only add their own shipments.")
 
     with st.form("shipment_form"):
         sender_name = st.text_input("Sender Name")
@@ -306,47 +293,65 @@ def add_shipment_page():
         submitted = st.form_submit_button("Add Shipment")
         if submitted:
             if all([sender_name, receiver_name, origin, destination, items]):
-                # Generate tracking ID
-                tracking_id = str(uuid.uuid4()).hex[:8].upper()
-                created_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                # Add shipment
-                shipment_id = add_shipment(sender_name, receiver_name, origin, destination, status, tracking_id, created_date, st.session_state.username)
-
-                # Add order
-                add_order(shipment_id, items, int(quantity), float(total_cost))
+                created_date = datetime.now()
+
+                # Add shipment and its order in one transaction; tracking_id is UNIQUE,
+                # so draw a fresh one on the (very unlikely) collision
+                for attempt in range(3):
+                    tracking_id = secrets.token_hex(4).upper()
+                    try:
+                        add_shipment_with_order(
+                            sender_name, receiver_name, origin, destination, status, tracking_id, created_date,
+                            st.session_state.username, items, int(quantity), float(total_cost)
+                        )
+                        break
+                    except sqlite3.IntegrityError:
+                        if attempt == 2:
+                            raise
 
                 st.success(f"Shipment added! Tracking ID: {tracking_id}")
                 st.balloons()
             else:
                 st.error("Please fill all fields.")
 
+# Tracking IDs are normalized on every rerun; memoize the few distinct inputs
+@lru_cache(maxsize=128)
+def _norm_tracking(x: str) -> str:
+    return x.strip().upper()
+
 # Track Shipment Page
+@st.fragment
 def track_shipment_page():
     st.header("🔍 Track Shipment")
-    tracking_id = st.text_input("Enter Tracking ID").upper().strip()
-
-    if st.button("Track"):
-        if not tracking_id:
+    # Inside a form the lookup runs once on submit, not on every keystroke
+    with st.form("track_form"):
+        entered_id = _norm_tracking(st.text_input("Enter Tracking ID"))
+        submitted = st.form_submit_button("Track")
+    if submitted:
+        if not entered_id:
             st.error("Please enter a Tracking ID.")
             return
+        st.session_state.tracked_id = entered_id
 
-        shipment = get_shipments(tracking_id=tracking_id)
-        if not shipment.empty:
+    # Remember the last lookup so the status update below survives its own rerun
+    tracking_id = st.session_state.get('tracked_id')
+    if tracking_id:
+        shipment = get_shipment_by_tracking(tracking_id)
+        if shipment is not None:
             st.success("Shipment found!")
             col1, col2 = st.columns(2)
             with col1:
-                st.write(f"**Sender:** {shipment.iloc[0]['sender_name']}")
-                st.write(f"**Receiver:** {shipment.iloc[0]['receiver_name']}")
-                st.write(f"**Origin:** {shipment.iloc[0]['origin']}")
-                st.write(f"**Destination:** {shipment.iloc[0]['destination']}")
+                st.write(f"**Sender:** {shipment['sender_name']}")
+                st.write(f"**Receiver:** {shipment['receiver_name']}")
+                st.write(f"**Origin:** {shipment['origin']}")
+                st.write(f"**Destination:** {shipment['destination']}")
             with col2:
-                st.write(f"**Status:** {shipment.iloc[0]['status']}")
-                st.write(f"**Created:** {shipment.iloc[0]['created_date']}")
+                st.write(f"**Status:** {shipment['status']}")
+                st.write(f"**Created:** {shipment['created_date']}")
 
             # Status update for admin/manager
             if st.session_state.role in ['admin', 'manager']:
-                new_status = st.selectbox("Update Status", ['Pending', 'In Transit', 'Delivered'], index=['Pending', 'In Transit', 'Delivered'].index(shipment.iloc[0]['status']) if shipment.iloc[0]['status'] in ['Pending', 'In Transit', 'Delivered'] else 0, key="update")
+                new_status = st.selectbox("Update Status", ['Pending', 'In Transit', 'Delivered'], index=['Pending', 'In Transit', 'Delivered'].index(shipment['status']) if shipment['status'] in ['Pending', 'In Transit', 'Delivered'] else 0, key="update")
                 if st.button("Update Status"):
                     update_shipment_status(tracking_id, new_status)
                     st.success(f"Status updated to {new_status}!")
@@ -357,30 +362,41 @@ def track_shipment_page():
             st.error("Shipment not found. Check the Tracking ID.")
 
 # View Orders Page
+@st.fragment
 def view_orders_page():
     st.header("📋 View Orders")
-    # Get joined data (shipments + orders)
-    shipments_df = get_shipments()
-    orders_df = get_orders()
-    if not orders_df.empty and not shipments_df.empty:
-        merged_df = pd.merge(orders_df, shipments_df, left_on='shipment_id', right_on='id', how='left')
-        merged_df = merged_df[['tracking_id', 'sender_name', 'receiver_name', 'status', 'items', 'quantity', 'total_cost']]
-    else:
-        merged_df = pd.DataFrame()
-
     # Filters
     status_filter = st.multiselect("Filter by Status", ['Pending', 'In Transit', 'Delivered'], default=['Pending', 'In Transit', 'Delivered'])
-    filtered_df = merged_df[merged_df['status'].isin(status_filter)] if not merged_df.empty else pd.DataFrame()
+    # Joined and filtered in SQL (orders + their shipment); only admins/managers see everyone's orders
+    owner = None if st.session_state.role in ['admin', 'manager'] else st.session_state.username
+    filtered_df = get_orders_with_shipments(status_filter, owner)
 
     st.dataframe(filtered_df)
 
     # Edit for admin/manager
     if st.session_state.role in ['admin', 'manager'] and not filtered_df.empty:
         st.write("Edit entries below (admin/manager only):")
-        edited_df = st.data_editor(filtered_df, num_rows="dynamic", use_container_width=True)
+        # Edits are positional, so the editor's identity follows the rows it shows;
+        # a different row set starts with a clean editor instead of replaying old edits
+        editor_key = f"orders_editor_{hash(tuple(filtered_df['order_id']))}"
+        st.data_editor(
+            filtered_df,
+            num_rows="fixed",
+            use_container_width=True,
+            disabled=[c for c in filtered_df.columns if c != 'status'],
+            column_config={"status": st.column_config.SelectboxColumn("status", options=['Pending', 'In Transit', 'Delivered'], required=True)},
+            key=editor_key,
+        )
         if st.button("Save Changes"):
-            # For demo, just show success (in real app, update DB row-by-row)
-            st.success("Changes saved! (Demo mode - updates reflected on refresh)")
+            # The editor state holds just the edited cells, keyed by row position in this frame
+            edited_rows = st.session_state[editor_key]["edited_rows"]
+            changes = [
+                (filtered_df['tracking_id'].iat[int(row)], cells['status'])
+                for row, cells in edited_rows.items()
+                if 'status' in cells and cells['status'] != filtered_df['status'].iat[int(row)]
+            ]
+            updated = bulk_update_statuses(changes)
+            st.success(f"Saved {updated} status change(s).")
             st.rerun()
     else:
         if st.session_state.role not in ['admin', 'manager']:
@@ -391,15 +407,15 @@ def profile_page():
     st.header("👤 User Profile")
     st.write(f"Welcome, {st.session_state.username}!")
 
-    # User's shipments
-    user_shipments = get_user_shipments(st.session_state.username)
-    if not user_shipments.empty:
+    # Counts come from the SQL aggregate; the table is only loaded when non-empty
+    user_counts = get_dashboard_kpis(st.session_state.username).set_index('status')['shipments']
+    total_user = int(user_counts.sum())
+    if total_user > 0:
         st.subheader("Your Shipments")
-        st.dataframe(user_shipments[['tracking_id', 'status', 'created_date']])
+        st.dataframe(get_user_shipment_list(st.session_state.username))
 
         # User-specific metrics
-        total_user = len(user_shipments)
-        pending_user = len(user_shipments[user_shipments['status'] == 'Pending'])
+        pending_user = int(user_counts.get('Pending', 0))
         st.metric("Your Total Shipments", total_user)
         st.metric("Your Pending", pending_user)
     else: